@@ -4,33 +4,60 @@ class FiltersControl:
     _tcp_host=""
     _tcp_port=16161
     _tcp_buffer=1024
+    _tcp_timeout=5.
+    _socket=None
 
     def __init__(self,hostname,hostport):
         self._tcp_host=hostname
         self._tcp_port=hostport
 
     def connect(self):
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.connect((self._tcp_host,self._tcp_port))
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Commands are a few bytes long, do not let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self._tcp_timeout)
+        sock.connect((self._tcp_host,self._tcp_port))
+        self._socket = sock
 
     def disconnect(self):
-        self._socket.close()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _receive(self):
+        # A reply can come in several segments: read until the filter
+        # closes the connection. If it keeps it open, whatever arrived
+        # before the timeout is the reply
+        chunks = []
+        while True:
+            try:
+                chunk = self._socket.recv(self._tcp_buffer)
+            except socket.timeout:
+                if chunks:
+                    break
+                raise
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def send_command(self, command):
+        # One connection per command: the filter side is not known to
+        # accept several commands on the same connection. The reply is read
+        # before the connection is closed
+        self.connect()
+        try:
+            self._socket.sendall(command.encode())
+            answer = self._receive()
+        finally:
+            self.disconnect()
+        return answer.decode()
 
     def erase_spec(self):
-        self.connect()
-        self._socket.send("erase")
-        self.disconnect()
-        print(self._socket.recv(self._tcp_buffer))
+        print(self.send_command("erase"))
 
     def write_spec(self):
-        self.connect()
-        self._socket.send("write")
-        self.disconnect()
-        print(self._socket.recv(self._tcp_buffer))
+        print(self.send_command("write"))
 
     def configure_filter(self):
-        self.connect()
-        self._socket.send("configure")
-        self.disconnect()
-        print(self._socket.recv(self._tcp_buffer))
-
+        print(self.send_command("configure"))
@@ -30,6 +30,7 @@ class TopologyManager:
     _writeBU = False
     _writeLF = False
     _writeRU = False
+    _transition_timeout = 60.
     def __init__(self,filename):
         self._topology_filename=filename
         self._parser=minidom.parse(self._topology_filename)
@@ -47,6 +48,7 @@ class TopologyManager:
         self._list_actors.clear()
         self._actor_type.clear()
         self._debug_on = False
+        self._stop_monitoring = threading.Event()
         #self._sock = socket.socket()
         #self._sock.connect(('localhost',2003))
 
@@ -57,20 +59,22 @@ class TopologyManager:
     def get_number_of_actors(self):
         tagname = self._parser.getElementsByTagName('i2o:target')
         for x in tagname:
-            if self._tag_ru in x.attributes['class'].value:
+            classname = x.attributes['class'].value
+            if self._tag_ru in classname:
                 self._number_ru=self._number_ru+1
-            elif self._tag_lf in x.attributes['class'].value:
+            elif self._tag_lf in classname:
                 self._number_lf=self._number_lf+1
-            elif self._tag_bu in x.attributes['class'].value:
+            elif self._tag_bu in classname:
                 self._number_bu=self._number_bu+1
-            elif self._tag_mu in x.attributes['class'].value:
+            elif self._tag_mu in classname:
                 self._number_mu=self._number_mu+1
-            elif self._tag_gf in x.attributes['class'].value:
+            elif self._tag_gf in classname:
                 self._number_gf=self._number_gf+1
 
     def get_actors(self):
         tagname = self._parser.getElementsByTagName('xc:Context')
         self._list_hosts = []
+        hosts_seen = set()
         for x in tagname:
             url = x.attributes['url'].value
             subtag = x.getElementsByTagName('xc:Application')
@@ -84,11 +88,8 @@ class TopologyManager:
                     self._ru_actors.append(XDAQActor(url,classname,instance,identity))
                 elif self._tag_lf in classname:
                     hostname = url[url.find('gal'):url.rfind(":")]
-                    alreadyPresent = False
-                    for h in self._list_hosts:
-                        if h == hostname:
-                            alreadyPresent = True
-                    if not alreadyPresent:
+                    if hostname not in hosts_seen:
+                        hosts_seen.add(hostname)
                         self._list_hosts.append(hostname)
                     self._lf_actors.append(XDAQActor(url,classname,instance,identity))
                 elif self._tag_bu in classname:
@@ -158,29 +159,73 @@ class TopologyManager:
         print("---- Number of merger units: ",       self._number_mu)
         print("---- Number of global filter units: ",self._number_gf)
 
+    def _query_all(self, actors, getter, timeout=None):
+        # Call the same getter on every actor concurrently, each actor has
+        # its own messenger so the SOAP round trips overlap. With a timeout
+        # the actors which have not answered in time are left as None
+        results = [None]*len(actors)
+        errors = [None]*len(actors)
+        def query(idx, act):
+            try:
+                results[idx] = getattr(act, getter)()
+            except Exception as e:
+                errors[idx] = e
+        myThreads = []
+        for idx,act in enumerate(actors):
+            myThreads.append(threading.Thread(target=query, args=(idx,act)))
+            myThreads[-1].daemon = True
+            myThreads[-1].start()
+        if timeout is None:
+            for thread in myThreads:
+                thread.join()
+        else:
+            deadline = time.monotonic() + timeout
+            for thread in myThreads:
+                thread.join(max(deadline - time.monotonic(), 0))
+        # Failures are raised in the caller, as a direct call would do
+        for e in errors:
+            if e is not None:
+                raise e
+        return results
+
+    def _wait_for_status(self, actors, status, timeout=None):
+        # Poll quickly first so fast transitions are noticed early, then
+        # back off to the usual half-second period for slow ones. Actors
+        # which already reached the state are not asked again. Returns the
+        # number of actors in the state when done or when the time is up
+        if timeout is None:
+            timeout = self._transition_timeout
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        pending = list(actors)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            # An actor which does not answer before the deadline is counted
+            # as not in the state
+            remaining = max(deadline - time.monotonic(), 0)
+            statuses = self._query_all(pending, 'check_status', remaining)
+            pending = [act for act, current in zip(pending, statuses) if current != status]
+            delay = min(delay*2, 0.5)
+        return len(actors) - len(pending)
+
+    def _transition(self, actors, action, status, timeout=None):
+        # Send the action to every actor in parallel, then wait for them to
+        # reach the requested state. Returns how many of them did
+        for act in actors:
+            threading.Thread(target=getattr(act, action)).start()
+        return self._wait_for_status(actors, status, timeout)
+
     def configure_pt(self):
         if self._pt_actors[0].check_status() == 'Ready':
             return True
 
         print("--- Configuring pt actors:")
-        actorOK = nbActors = 0 
-        myThreads = []
-        nbActors += len(self._pt_actors)
-        for act in self._pt_actors:
-            myThreads.append(threading.Thread(target=act.configure))
-            myThreads[-1].start()
-                
-        allConfigured = False
-        maxIteration = 0
-        while not allConfigured:
-            time.sleep(0.5)
-            for act in self._pt_actors:
-                if act.check_status() == 'Ready':
-                    allConfigured = True
-                    actorOK += 1
-                else:
-                    allConfigured = False
-                    
+        nbActors = len(self._pt_actors)
+        actorOK = self._transition(self._pt_actors, 'configure', 'Ready')
+
         if  nbActors == actorOK:
             return True
         else :
@@ -191,24 +236,9 @@ class TopologyManager:
             return True
 
         print("--- Starting pt actors:")
-        actorOK = nbActors = 0 
-        myThreads = []
-        nbActors += len(self._pt_actors)
-        for act in self._pt_actors:
-            myThreads.append(threading.Thread(target=act.enable))
-            myThreads[-1].start()
-                
-        allRunning = False
-        maxIteration = 0
-        while not allRunning:
-            time.sleep(0.5)
-            for act in self._pt_actors:
-                if act.check_status() == 'Enabled':
-                    allRunning = True
-                    actorOK += 1
-                else:
-                    allRunning = False
-                    
+        nbActors = len(self._pt_actors)
+        actorOK = self._transition(self._pt_actors, 'enable', 'Enabled')
+
         if  nbActors == actorOK:
             return True
         else :
@@ -222,23 +252,12 @@ class TopologyManager:
         actorOK = nbActors = 0 
         for idx,actors in  enumerate(self._list_actors):
             print(self._actor_type[idx])
-            myThreads = []
             nbActors += len(actors)
-            for act in actors:
-                myThreads.append(threading.Thread(target=act.configure))
-                myThreads[-1].start()
-                
-            allConfigured = False
-            maxIteration = 0
-            while not allConfigured:
-                time.sleep(0.5)
-                for act in actors:
-                    if act.check_status() == 'Configured':
-                        allConfigured = True
-                        actorOK += 1
-                    else:
-                        allConfigured = False
-                            
+            actorOK += self._transition(actors, 'configure', 'Configured')
+            # The next units are fed by this group, stop if it failed
+            if actorOK != nbActors:
+                break
+
         if  nbActors == actorOK:
             return True
         else :
@@ -255,21 +274,11 @@ class TopologyManager:
         actorOK = nbActors = 0 
         for idx in  range(len(self._list_actors)-1,-1,-1):
             print(self._actor_type[idx])
-            myThreads = []
             nbActors += len(self._list_actors[idx])
-            for act in self._list_actors[idx]:
-                myThreads.append(threading.Thread(target=act.enable))
-                myThreads[-1].start()
-            allStarted = False
-            maxIteration = 0
-            while not allStarted:
-                time.sleep(0.5)
-                for act in self._list_actors[idx]:
-                    if act.check_status() == 'Running':
-                        allStarted = True
-                        actorOK += 1
-                    else:
-                        allStarted = False
+            actorOK += self._transition(self._list_actors[idx], 'enable', 'Running')
+            # This group feeds the units started before it, stop if it failed
+            if actorOK != nbActors:
+                break
         if  nbActors == actorOK:
             return True
         else :
@@ -284,22 +293,8 @@ class TopologyManager:
         actorOK = nbActors = 0 
         for idx,actors in  enumerate(self._list_actors):
             print(self._actor_type[idx])
-            myThreads = []
             nbActors += len(actors)
-            for act in actors:
-                myThreads.append(threading.Thread(target=act.halt))
-                myThreads[-1].start()
-                
-            allStopped = False
-            maxIteration = 0
-            while not allStopped:
-                time.sleep(0.5)
-                for act in actors:
-                    if act.check_status() == 'Halted':
-                        allStopped = True
-                        actorOK += 1
-                    else:
-                        allStopped = False
+            actorOK += self._transition(actors, 'halt', 'Halted')
 
         '''Increment the run to the next '''
         self.set_run_number(self.return_run_number()+1)        
@@ -409,27 +404,35 @@ class TopologyManager:
     
     def get_daq_status(self):
         daq_status = "Unknown"
+        # The readout units only need to be queried once per call, not once
+        # per enabled transport
+        ru_status = None
         for act in self._pt_actors:
-            if "Halted" in act.check_status():
+            status = act.check_status()
+            if "Halted" in status:
                 daq_status = "Unknown"
-            elif "Enabled" in act.check_status():
-                daq_status = "Initialized"
-                for actDaq in self._ru_actors:
-                    if "Configured" in actDaq.check_status():
-                        daq_status = "Configured"
-                    elif "Running" in actDaq.check_status():
-                        daq_status = "Running"
-                    elif "Halted" in actDaq.check_status():
-                        daq_status = "Initialized"
+            elif "Enabled" in status:
+                if ru_status is None:
+                    ru_status = "Initialized"
+                    for statusDaq in self._query_all(self._ru_actors, 'check_status'):
+                        if "Configured" in statusDaq:
+                            ru_status = "Configured"
+                        elif "Running" in statusDaq:
+                            ru_status = "Running"
+                        elif "Halted" in statusDaq:
+                            ru_status = "Initialized"
+                daq_status = ru_status
         return daq_status
     
     def start_monitoring_thread(self):
         self._running=True
+        self._stop_monitoring.clear()
         self._thread_monitoring = threading.Thread(target=self.monitor_actors)
         self._thread_monitoring.start()
 
     def stop_monitoring_thread(self):
         self._running=False
+        self._stop_monitoring.set()
         self._thread_monitoring.join(timeout=5.)
 
     def get_list_hosts(self):
@@ -447,24 +450,29 @@ class TopologyManager:
         return str(message)
     
     def monitor_actors(self):
-        while self._ru_actors[0].check_status() == "Running":
+        # The metric names only depend on the topology, build them once
+        allActors = [act for actors in self._list_actors for act in actors]
+        prefixes = []
+        for act in allActors:
+            host = str(act.return_hostname())
+            host = host[0:host.find(".lnl")]
+            host=host.replace("-","_")
+            classname = str(act.return_classname_nice())
+            classname=classname.replace(" ","_")
+            prefixes.append('xdaq.{:s}.{:s}.{:d}.'.format(classname,host,act.return_instance()))
+        while not self._stop_monitoring.is_set() and \
+              self._ru_actors[0].check_status() == "Running":
             localtime=int(time.time())
+            bandwiths = self._query_all(allActors, 'get_bandwiths')
+            if self._stop_monitoring.is_set():
+                break
             message = ""
-            for idx,actors in  enumerate(self._list_actors) :
-                for act in actors:
-                    host = str(act.return_hostname())
-                    host = host[0:host.find(".lnl")]
-                    host=host.replace("-","_")
-                    classname = str(act.return_classname_nice())
-                    classname=classname.replace(" ","_")
-                    message += 'xdaq.{:s}.{:s}.{:d}.outputBufferRate {:s} {:d}\n'.\
-                        format(classname,host,act.return_instance(),
-                               act.get_output_bandwith(),localtime)
-                    message += 'xdaq.{:s}.{:s}.{:d}.inputBufferRate {:s} {:d}\n'.\
-                        format(classname,host,act.return_instance(),
-                               act.get_input_bandwith(),localtime)
+            for prefix, (inputBandw, outputBandw) in zip(prefixes, bandwiths):
+                message += '{:s}outputBufferRate {:s} {:d}\n'.format(prefix,outputBandw,localtime)
+                message += '{:s}inputBufferRate {:s} {:d}\n'.format(prefix,inputBandw,localtime)
             #self._sock.sendall(message.encode())
-            time.sleep(0.5)
+            if self._stop_monitoring.wait(0.5):
+                break
             
     def set_coincidence_window(self,window):
         '''For the moment we set the same time window for all the builders/merger'''
@@ -4,6 +4,13 @@ import xml.etree.ElementTree as ET
 import time
 import socket
 
+# Checked in order, the first tag found in the XDAQ class name wins
+_NICE_CLASSNAMES = (("Readout",    "Readout_Unit"),
+                    ("Local",      "Local_Filter"),
+                    ("::bu::",     "Builder_Unit"),
+                    ("::merger::", "Merger_Unit"),
+                    ("Global",     "Global_Filter"))
+
 class XDAQActor:
     _url = ""
     _hostname = ""
@@ -21,6 +28,7 @@ class XDAQActor:
         self._hostport=url[url.rfind(':')+1:]
         self._messenger=XDAQMessenger(self._hostname,self._hostport,self._instance,self._classname)
         self._id = identity
+        self._classname_nice = self.compute_classname_nice()
         
     def set_url(self, url):
         self._url = url
@@ -56,21 +64,13 @@ class XDAQActor:
         return self._identity
 
     def return_classname_nice(self):
-        name = ""
-        if "Readout" in self._classname:
-            name = "Readout_Unit"
-        elif "Local" in self._classname:
-            name = "Local_Filter"
-        elif "::bu::" in self._classname:
-            name = "Builder_Unit"
-        elif "::merger::" in self._classname:
-            name = "Merger_Unit"
-        elif "Global" in self._classname:
-            name ="Global_Filter"
-        else:
-            name =self._classname
-        
-        return name
+        return self._classname_nice
+
+    def compute_classname_nice(self):
+        for tag, name in _NICE_CLASSNAMES:
+            if tag in self._classname:
+                return name
+        return self._classname
 
     def return_url(self):
         return self._url
@@ -85,27 +85,34 @@ class XDAQActor:
               " host = ", self._hostname,
               " port = ", self._hostport)
         
+    def parse_parameter(self, answer, parName, width=20):
+        positionEnd = answer.find("</p:"+parName)
+        positionBeg = answer.rfind(">",positionEnd-width,positionEnd)
+        return answer[positionBeg+1:positionEnd]
+
+    def get_parameter(self, parName, parType, width=20):
+        message = self._messenger.create_info_message(parName,parType)
+        answer = self._messenger.send_query(message)
+        return self.parse_parameter(answer,parName,width)
+
+    def get_parameters(self, parameters, width=20):
+        message = self._messenger.create_multi_info_message(parameters)
+        answer = self._messenger.send_query(message)
+        return [self.parse_parameter(answer,parName,width) for parName, parType in parameters]
+
     def check_status(self):
-        message = self._messenger.create_info_message("stateName","xsd:string")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:stateName")
-        positionBeg = answer.rfind(">",positionEnd-20,positionEnd)
-        status = answer[positionBeg+1:positionEnd]
-        return status              
+        return self.get_parameter("stateName","xsd:string")
 
     def get_output_bandwith(self):
-        message = self._messenger.create_info_message("outputBandw","xsd:string")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:outputBandw")
-        positionBeg = answer.rfind(">",positionEnd-20,positionEnd)
-        return answer[positionBeg+1:positionEnd]
+        return self.get_parameter("outputBandw","xsd:string")
 
     def get_input_bandwith(self):
-        message = self._messenger.create_info_message("inputBandw","xsd:string")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:inputBandw")
-        positionBeg = answer.rfind(">",positionEnd-20,positionEnd)
-        return answer[positionBeg+1:positionEnd]
+        return self.get_parameter("inputBandw","xsd:string")
+
+    def get_bandwiths(self):
+        # Input and output bandwidth in a single SOAP round trip
+        return self.get_parameters([("inputBandw","xsd:string"),
+                                    ("outputBandw","xsd:string")])
         
     def configure(self):
         message = self._messenger.create_action_message("Configure")
@@ -126,11 +133,7 @@ class XDAQActor:
         self._messenger.send_message(message)
 
     def get_run_number(self):
-        message = self._messenger.create_info_message("runNumber","xsd:unsignedInt")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:runNumber")
-        positionBeg = answer.rfind(">",positionEnd-20,positionEnd)
-        return int(answer[positionBeg+1:positionEnd])
+        return int(self.get_parameter("runNumber","xsd:unsignedInt"))
 
     def set_coinc_window(self,window):
         message = self._messenger.create_parameter_message("merge_window",
@@ -139,11 +142,7 @@ class XDAQActor:
         self._messenger.send_message(message)
 
     def get_coinc_window(self):
-        message = self._messenger.create_info_message("merge_window","xsd:unsignedInt")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:merge_window")
-        positionBeg = answer.rfind(">",positionEnd-20,positionEnd)
-        return int(answer[positionBeg+1:positionEnd])
+        return int(self.get_parameter("merge_window","xsd:unsignedInt"))
 
     def set_file_enable(self,file_enable):
         message = ""
@@ -161,8 +160,4 @@ class XDAQActor:
         
 
     def get_configuration_file(self):
-        message = self._messenger.create_info_message("configFilepath","xsd:string")
-        answer = self._messenger.send_message(message)
-        positionEnd = answer.find("</p:configFilepath")
-        positionBeg = answer.rfind(">",positionEnd-60,positionEnd)
-        return answer[positionBeg+1:positionEnd]
+        return self.get_parameter("configFilepath","xsd:string",60)
@@ -1,6 +1,10 @@
 import zeep
 import pycurl 
 from io import StringIO, BytesIO
+import threading
+
+_SOAP_HEADER = "<SOAP-ENV:Envelope SOAP-ENV:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" xmlns:SOAP-ENV=\"http://schemas.xmlsoap.org/soap/envelope/\" xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xmlns:xsd=\"http://www.w3.org/2001/XMLSchema\" xmlns:SOAP-ENC=\"http://schemas.xmlsoap.org/soap/encoding/\"><SOAP-ENV:Header></SOAP-ENV:Header><SOAP-ENV:Body>"
+_SOAP_FOOTER = "</SOAP-ENV:Body></SOAP-ENV:Envelope>"
 
 class XDAQMessenger:
     _message=""
@@ -8,6 +12,8 @@ class XDAQMessenger:
     _hostport=""
     _instance=""
     _classname=""
+    _connect_timeout=5.
+    _query_timeout=10.
     
     def __init__(self, hostname, hostport, instance, classname):
         self._message="toto"
@@ -15,35 +21,81 @@ class XDAQMessenger:
         self._hostport = hostport
         self._instance = str(instance)
         self._classname = classname
+        self._url = "http://"+self._hostname+":"+self._hostport
+        self._header = ["SOAPAction: urn:xdaq-application:class="+self._classname+",instance="+self._instance,
+                        "Content-Type: text/xml",
+                        "Content-Description: SOAP Message"]
+        # Actions and ParameterGet requests only depend on their arguments,
+        # so each distinct message is built once and reused
+        self._messages = {}
+        self._curl = None
+        self._curl_lock = threading.Lock()
 
     def create_action_message(self,action):
-        message = "<SOAP-ENV:Envelope SOAP-ENV:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" xmlns:SOAP-ENV=\"http://schemas.xmlsoap.org/soap/envelope/\" xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xmlns:xsd=\"http://www.w3.org/2001/XMLSchema\" xmlns:SOAP-ENC=\"http://schemas.xmlsoap.org/soap/encoding/\"><SOAP-ENV:Header></SOAP-ENV:Header><SOAP-ENV:Body><xdaq:"+action+" xmlns:xdaq=\"urn:xdaq-soap:3.0\"/></SOAP-ENV:Body></SOAP-ENV:Envelope>" 
+        key = ("action", action)
+        message = self._messages.get(key)
+        if message is None:
+            message = _SOAP_HEADER+"<xdaq:"+action+" xmlns:xdaq=\"urn:xdaq-soap:3.0\"/>"+_SOAP_FOOTER
+            self._messages[key] = message
         return message
 
     def create_info_message(self,parName, parType):
-        message = "<SOAP-ENV:Envelope SOAP-ENV:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" xmlns:SOAP-ENV=\"http://schemas.xmlsoap.org/soap/envelope/\" xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xmlns:xsd=\"http://www.w3.org/2001/XMLSchema\" xmlns:SOAP-ENC=\"http://schemas.xmlsoap.org/soap/encoding/\"><SOAP-ENV:Header></SOAP-ENV:Header><SOAP-ENV:Body><xdaq:ParameterGet xmlns:xdaq=\"urn:xdaq-soap:3.0\"><p:properties xmlns:p=\"urn:xdaq-application:"+self._classname+"\" xsi:type=\"soapenc:Struct\"><p:"+parName+" xsi:type=\""+parType+"\"/></p:properties></xdaq:ParameterGet></SOAP-ENV:Body></SOAP-ENV:Envelope>";
+        return self.create_multi_info_message([(parName,parType)])
+
+    def create_multi_info_message(self,parameters):
+        key = ("info", tuple(parameters))
+        message = self._messages.get(key)
+        if message is None:
+            message = self.build_info_message(parameters)
+            self._messages[key] = message
+        return message
+
+    def build_info_message(self,parameters):
+        properties = ""
+        for parName, parType in parameters:
+            properties += "<p:"+parName+" xsi:type=\""+parType+"\"/>"
+        message = _SOAP_HEADER+"<xdaq:ParameterGet xmlns:xdaq=\"urn:xdaq-soap:3.0\"><p:properties xmlns:p=\"urn:xdaq-application:"+self._classname+"\" xsi:type=\"soapenc:Struct\">"+properties+"</p:properties></xdaq:ParameterGet>"+_SOAP_FOOTER
         return message
 
     def create_parameter_message(self,parName,parType,parValue):
-        message = "<SOAP-ENV:Envelope SOAP-ENV:encodingStyle=\"http://schemas.xmlsoap.org/soap/encoding/\" xmlns:SOAP-ENV=\"http://schemas.xmlsoap.org/soap/envelope/\" xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xmlns:xsd=\"http://www.w3.org/2001/XMLSchema\" xmlns:SOAP-ENC=\"http://schemas.xmlsoap.org/soap/encoding/\"><SOAP-ENV:Header></SOAP-ENV:Header><SOAP-ENV:Body><xdaq:ParameterSet xmlns:xdaq=\"urn:xdaq-soap:3.0\"><p:properties xmlns:p=\"urn:xdaq-application:"+self._classname+"\" xsi:type=\"soapenc:Struct\"><p:"+parName+" xsi:type=\""+parType+"\">"+parValue+"</p:"+parName+"></p:properties></xdaq:ParameterSet></SOAP-ENV:Body></SOAP-ENV:Envelope>"
+        message = _SOAP_HEADER+"<xdaq:ParameterSet xmlns:xdaq=\"urn:xdaq-soap:3.0\"><p:properties xmlns:p=\"urn:xdaq-application:"+self._classname+"\" xsi:type=\"soapenc:Struct\"><p:"+parName+" xsi:type=\""+parType+"\">"+parValue+"</p:"+parName+"></p:properties></xdaq:ParameterSet>"+_SOAP_FOOTER
         return message
 
     def send_message(self,message):
-        hostURL="http://"+self._hostname+":"+self._hostport
-    
-        actionClient="SOAPAction: urn:xdaq-application:class="+self._classname+",instance="+self._instance
-        header = [actionClient,"Content-Type: text/xml","Content-Description: SOAP Message"]
-        answer = BytesIO()
+        # Actions can take as long as the transition they trigger, so each
+        # one gets its own handle and never holds up the status queries
         c = pycurl.Curl()
-        c.setopt(pycurl.URL, hostURL)
-        c.setopt(pycurl.HTTPHEADER, header)
+        answer = BytesIO()
+        c.setopt(pycurl.URL, self._url)
+        c.setopt(pycurl.HTTPHEADER, self._header)
         c.setopt(pycurl.POST,0)
         c.setopt(pycurl.POSTFIELDS, str(message))
         c.setopt(pycurl.WRITEFUNCTION, answer.write)
-        c.setopt(pycurl.WRITEDATA,answer)
 #        c.setopt(pycurl.VERBOSE,2)
         c.perform()
-        response=answer.getvalue().decode('UTF-8')
         c.close()
+        response=answer.getvalue().decode('UTF-8')
+        return response
+
+    def send_query(self,message,timeout=None):
+        # ParameterGet requests go through a handle kept between messages,
+        # so the connection to the XDAQ executive is reused. A handle must
+        # not be shared by two threads at once, hence the lock, and every
+        # request is bounded so a stuck executive cannot hold it forever
+        if timeout is None:
+            timeout = self._query_timeout
+        answer = BytesIO()
+        with self._curl_lock:
+            if self._curl is None:
+                self._curl = pycurl.Curl()
+                self._curl.setopt(pycurl.URL, self._url)
+                self._curl.setopt(pycurl.HTTPHEADER, self._header)
+                self._curl.setopt(pycurl.CONNECTTIMEOUT_MS, int(self._connect_timeout*1000))
+            c = self._curl
+            c.setopt(pycurl.TIMEOUT_MS, max(int(timeout*1000), 1))
+            c.setopt(pycurl.POST,0)
+            c.setopt(pycurl.POSTFIELDS, str(message))
+            c.setopt(pycurl.WRITEFUNCTION, answer.write)
+            c.perform()
+        response=answer.getvalue().decode('UTF-8')
         return response
-        